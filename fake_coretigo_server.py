@@ -1,5 +1,6 @@
 import logging
 import asyncio
+import os
 import sys
 sys.path.insert(0, "..")
 
@@ -39,9 +40,11 @@ async def main():
         port2_PI = await myobj.add_variable(idx, 'Port 2', 2)
         port3_PI = await myobj.add_variable(idx, 'Port 3', 3)
         port4_PI = await myobj.add_variable(idx, 'Port 4', 4)
-        await server.export_xml([server.nodes.objects, server.nodes.root, myobj], "basic_opcua_cip.xml")
-        while True:
-            await asyncio.sleep(1)
+        # the address space is static, only re-export the nodeset when asked to
+        if os.environ.get("EXPORT_XML") == "1":
+            await server.export_xml([server.nodes.objects, server.nodes.root, myobj], "basic_opcua_cip.xml")
+        # nothing to do in this task, wait without waking up every second
+        await asyncio.Event().wait()
             
 
 
@@ -4,25 +4,18 @@ import logging
 from asyncua import Client, client
 
 _logger = logging.getLogger('asyncua')
-async def client_reader(client, idx, nodeid):
-        print(idx, nodeid)
-        node_string = "ns={};i={}".format(idx, nodeid)
-        var = client.get_node(node_string)
-        print(node_string)
-        data = await var.read_value()
-        print('byte data is')
-        print(data)
-        return data
-async def client_writer(client, idx, nodeid, data):
-        print(idx, nodeid)
-        node_string = "ns={};i={}".format(idx, nodeid)
-        var = client.get_node(node_string)
-        data = await var.write_value(data)
-        print('byte data is')
-        print(data)
-        return data
+def client_nodes(client, idx, nodeids):
+        # resolve the Node objects once, the polling loop only reads/writes them
+        return [client.get_node("ns={};i={}".format(idx, nodeid)) for nodeid in nodeids]
+async def client_batch_reader(client, nodes):
+        # one Read service call for all nodes instead of one round trip per node,
+        # checking each status the way read_value does instead of passing on None
+        data_values = await client.read_attributes(nodes)
+        for data_value in data_values:
+            data_value.StatusCode.check()
+        return [data_value.Value.Value for data_value in data_values]
 def data_converter(bytes_raw, dict_converter):
-        data_bytes = bytes_raw[dict_converter["start"],dict_converter["end"]]
+        data_bytes = bytes_raw[dict_converter["start"]:dict_converter["end"]]
         data = int.from_bytes(data_bytes, byteorder='big',signed=True)
         value = data * dict_converter["gradient"]
         return value
@@ -51,16 +44,12 @@ async def main():
     nsidx = 2
     tigo_nodeids = [2,3,4,5] #[pressure pipe, #pressure tan level, temperature pipe, conductivity]
     nodeids = [2,3,4,5] #[pressure pipe, #pressure tan level, temperature pipe, conductivity]
-    dict_conv1 = {"nbytes":4, "rbytes":4, "start":2 , "end":16, "gradient":0.01, "conversion": 1}
-    dict_conv2 = {"nbytes":4, "rbytes":4, "start":2 , "end":16, "gradient":0.01, "conversion": 0.0254}
-    dict_conv3 = {"nbytes":2, "rbytes":2, "start":0 , "end":16, "gradient":0.1, "conversion": 1}
-    dict_conv4 = {"nbytes":2, "rbytes":2, "start":0 , "end":16, "gradient":0.1, "conversion": 1}
-    converters = [dict_conv1 , dict_conv2, dict_conv3, dict_conv4]
+    tigo_nodes = client_nodes(tigo_client, tigo_nsidx, tigo_nodeids)
+    nodes = client_nodes(client, nsidx, nodeids)
     while(True):
-        for tigo_nodeid, nodeid, converter in zip(tigo_nodeids, nodeids, converters):
-            raw_data = await client_reader(tigo_client, tigo_nsidx, tigo_nodeid)
-            print
-            await client_writer.write_value(client, tigo_nsidx, tigo_nodeid, raw_data)
+        data_list = await client_batch_reader(tigo_client, tigo_nodes)
+        # one Write service call for all nodes instead of one round trip per node
+        await client.write_values(nodes, [float(data) for data in data_list])
         await asyncio.sleep(1)
        
 
@@ -1,11 +1,12 @@
-import  xml.etree.ElementTree as ET
+from lxml import etree
 import requests
-import json
+import orjson
 import time
 import re
 import boto3
 from botocore.exceptions import ClientError
 import os
+from pathlib import Path
 from datetime import datetime
 # IP FOR MASTER
 url = 'http://169.254.189.227/'
@@ -20,8 +21,22 @@ read_blob_data_payload = "{\"code\": \"request\", \"cid\": 1235, \"adr\": \"/iol
 
 s3 = boto3.resource('s3')
 
-def create_parser_dictionaries(filepath):
-    unit_codes_SI = [
+# IODD of the connected sensor, resolved once next to this script
+iodd_file = Path(__file__).parent / 'ifm-vvb020.xml'
+
+# IODD XPaths, compiled once
+iodd_namespaces = {'io': 'http://www.io-link.com/IODD/2010/10'}
+device_function = './io:ProfileBody/io:DeviceFunction'
+records_xpath = etree.XPath(device_function + '/io:ProcessDataCollection/io:ProcessData/io:ProcessDataIn/io:Datatype', namespaces=iodd_namespaces)
+menus_xpath = etree.XPath(device_function + '/io:UserInterface/io:MenuCollection/io:Menu', namespaces=iodd_namespaces)
+texts_xpath = etree.XPath('./io:ExternalTextCollection/io:PrimaryLanguage/io:Text', namespaces=iodd_namespaces)
+record_items_xpath = etree.XPath('./io:RecordItem', namespaces=iodd_namespaces)
+simple_datatype_xpath = etree.XPath('./io:SimpleDatatype', namespaces=iodd_namespaces)
+name_id_xpath = etree.XPath('./io:Name/@textId', namespaces=iodd_namespaces)
+value_range_xpath = etree.XPath('./io:ValueRange', namespaces=iodd_namespaces)
+record_item_ref_xpath = etree.XPath('./io:RecordItemRef', namespaces=iodd_namespaces)
+
+unit_codes_SI = [
     1000, # K degrees
     1001, # C degrees
     1010, # meters
@@ -30,86 +45,73 @@ def create_parser_dictionaries(filepath):
     1054, #s
     1061, #m/s
     1076, #m2/s
-    ]
-    string_unit_codes_SI = [
-        '1000', # K degrees
-        '1001', # C degrees
-        '1010', # meters
-        '1023', #m2
-        '1034', #m3
-        '1054', #s
-        '1061', #m/s
-        '1076', #m/s2
-    ]
-    dict_unit_codes_SI = {
-        '1000': 'K degrees',
-        '1001': 'C degrees',
-        '1010': 'meters',
-        '1023': 'm2',
-        '1034': 'm3',
-        '1054': 's',
-        '1061': 'm/s',
-        '1076': 'm/s2',
-    }
-    tree = ET.parse(filepath)
+]
+string_unit_codes_SI = [
+    '1000', # K degrees
+    '1001', # C degrees
+    '1010', # meters
+    '1023', #m2
+    '1034', #m3
+    '1054', #s
+    '1061', #m/s
+    '1076', #m/s2
+]
+dict_unit_codes_SI = {
+    '1000': 'K degrees',
+    '1001': 'C degrees',
+    '1010': 'meters',
+    '1023': 'm2',
+    '1034': 'm3',
+    '1054': 's',
+    '1061': 'm/s',
+    '1076': 'm/s2',
+}
+# observation menus whose id ends in one of the SI unit codes, compiled once
+observation_menu = re.compile("^M_MR_SR_Observation_.*(" + "|".join(string_unit_codes_SI) + ")$")
+
+def create_parser_dictionaries(filepath):
+    tree = etree.parse(filepath)
     root = tree.getroot()
 
-    level_0 = root.findall('./{http://www.io-link.com/IODD/2010/10}ProfileBody')
-    level_0_1 = level_0[0]
-    level_1 = level_0_1.findall('./{http://www.io-link.com/IODD/2010/10}DeviceFunction')
-    level_1_1 = level_1[0]
-    level_2 = level_1_1.findall('./{http://www.io-link.com/IODD/2010/10}ProcessDataCollection')
-    level_2_1 = level_2[0]
-    level_3 = level_2_1.findall('./{http://www.io-link.com/IODD/2010/10}ProcessData')
-    level_3_1 = level_3[0]
-    level_4 = level_3_1.findall('./{http://www.io-link.com/IODD/2010/10}ProcessDataIn')
-    level_4_1 = level_4[0]
-    level_5 = level_4_1.findall('./{http://www.io-link.com/IODD/2010/10}Datatype')
-    records_collection = level_5[0]
-
-    level_2 = level_1_1.findall('./{http://www.io-link.com/IODD/2010/10}UserInterface')
-    level_2_1 = level_2[0]
-    level_3 = level_2_1.findall('./{http://www.io-link.com/IODD/2010/10}MenuCollection')
-    level_3_1 = level_3[0]
-    menus = level_3_1.findall('./{http://www.io-link.com/IODD/2010/10}Menu')
-
-    text_root =  root.findall('./{http://www.io-link.com/IODD/2010/10}ExternalTextCollection')
-    text_root_1 = text_root[0]
-    text_1 = text_root_1.findall('./{http://www.io-link.com/IODD/2010/10}PrimaryLanguage')
-    text_1_1 = text_1[0]
+    records_collection = records_xpath(root)[0]
+    menus = menus_xpath(root)
+    # textId -> text lookup built once instead of searching the texts per record
+    texts = {text.get('id'): text.get('value') for text in texts_xpath(root)}
 
     data_parse_dictionary = []
+    # xsi:type per subindex, only the decoder needs it so it stays out of the uploaded records
+    data_types = {}
     i = 0
     total_length = records_collection.get('bitLength')
-    for record in records_collection:
+    for record in record_items_xpath(records_collection):
         data_parse_dictionary.append({}) 
-        data = record.findall('./{http://www.io-link.com/IODD/2010/10}SimpleDatatype')
-        names = record.findall('./{http://www.io-link.com/IODD/2010/10}Name')
-        nameid = names[0].get('textId')
-        text = text_1_1.findall("./{http://www.io-link.com/IODD/2010/10}Text[@id='"+ nameid +"']")
-        data_parse_dictionary[i]['name'] = text[0].get('value')
+        data = simple_datatype_xpath(record)
+        nameid = name_id_xpath(record)[0]
+        data_parse_dictionary[i]['name'] = texts[nameid]
         data_parse_dictionary[i]['bitOffset'] = record.get('bitOffset')
         data_parse_dictionary[i]['subindex'] = record.get('subindex')
         data_parse_dictionary[i]['bitLength'] = data[0].get('bitLength')
-        valueRange = data[0].findall('./{http://www.io-link.com/IODD/2010/10}ValueRange')
+        data_types[record.get('subindex')] = data[0].get('{http://www.w3.org/2001/XMLSchema-instance}type')
+        valueRange = value_range_xpath(data[0])
         if len(valueRange):
             data_parse_dictionary[i]['low_val'] = valueRange[0].get('lowerValue')
             data_parse_dictionary[i]['up_val'] = valueRange[0].get('upperValue')
         i = i + 1 
 
+    # one pattern for all SI unit codes and a subindex lookup, instead of menus x units x records
+    data_parse_by_subindex = {data_parse_dic['subindex']: data_parse_dic for data_parse_dic in data_parse_dictionary}
     for menu in menus:
-        for unit in string_unit_codes_SI:
-            if re.search("^M_MR_SR_Observation_.*"+unit+"$", menu.get("id")):
-                records = menu.findall('./{http://www.io-link.com/IODD/2010/10}RecordItemRef')
-                record= records[0]
-                subindex = record.get("subindex")
-                for data_parse_dic in data_parse_dictionary:
-                    if data_parse_dic['subindex'] == subindex:
-                        data_parse_dic['gradient'] = record.get("gradient")
-                        data_parse_dic['offset'] = record.get("offset")
-                        data_parse_dic['displayFormat'] = record.get("displayFormat")
-                        data_parse_dic['unitCode'] = record.get("unitCode")
-                        data_parse_dic['units'] = dict_unit_codes_SI[record.get("unitCode")]
+        if observation_menu.search(menu.get("id")):
+            records = record_item_ref_xpath(menu)
+            record= records[0]
+            subindex = record.get("subindex")
+            data_parse_dic = data_parse_by_subindex.get(subindex)
+            if data_parse_dic is not None:
+                data_parse_dic['gradient'] = record.get("gradient")
+                data_parse_dic['offset'] = record.get("offset")
+                data_parse_dic['displayFormat'] = record.get("displayFormat")
+                data_parse_dic['unitCode'] = record.get("unitCode")
+                data_parse_dic['units'] = dict_unit_codes_SI[record.get("unitCode")]
   
 
     # Payloads:
@@ -117,22 +119,42 @@ def create_parser_dictionaries(filepath):
 
     
 
-    return data_parse_dictionary, total_length
+    return data_parse_dictionary, total_length, data_types
 
-def data_parser(data_parse_dictionary, total_length, hex_value):
-    data_dictionary = {}
+def create_parser_plan(data_parse_dictionary, total_length, data_types):
+    # decoding constants are fixed per IODD, so work them out once instead of for every payload
+    parser_plan = []
+    # bytes a payload must have for every planned field to be present
+    payload_length = 0
     for data_point in data_parse_dictionary:
         if ('up_val' in data_point):
-            hex_start = int((int(total_length) - int(data_point['bitOffset']) - int(data_point['bitLength'])) / 4)
-            hex_end = int((int(total_length) - int(data_point['bitOffset'])) / 4)
+            # the plan slices whole bytes, a field off a byte boundary would decode the wrong bits
+            if int(data_point['bitOffset']) % 8 or int(data_point['bitLength']) % 8:
+                raise ValueError("{} is not byte aligned (bitOffset {}, bitLength {})".format(data_point['name'], data_point['bitOffset'], data_point['bitLength']))
+            byte_start = (int(total_length) - int(data_point['bitOffset']) - int(data_point['bitLength'])) // 8
+            byte_end = (int(total_length) - int(data_point['bitOffset'])) // 8
             total_bits = int(data_point['bitLength'])
             low_val = int(data_point['low_val'])
             up_val = int(data_point['up_val'])
+            scale = (up_val - low_val) / (2**(total_bits-1))
             if ('offset' in data_point):
                 offset = int(data_point['offset'])
             else:
                 offset = 0
-            data_point['value'] = int(hex_value[hex_start:hex_end], 16) * (up_val - low_val) / (2**(total_bits-1)) + offset
+            signed = data_types[data_point['subindex']] == 'IntegerT'
+            parser_plan.append((data_point, byte_start, byte_end, signed, scale, offset))
+            payload_length = max(payload_length, byte_end)
+    return parser_plan, payload_length
+
+def data_parser(data_parse_dictionary, parser_plan, payload_length, hex_value):
+    data_dictionary = {}
+    # convert the payload once, then decode each field straight from the bytes
+    raw = bytes.fromhex(hex_value)
+    # slicing past the end gives empty bytes that decode as 0, so refuse a short payload outright
+    if len(raw) < payload_length:
+        raise ValueError("payload has {} bytes, the IODD process data needs {}".format(len(raw), payload_length))
+    for data_point, byte_start, byte_end, signed, scale, offset in parser_plan:
+        data_point['value'] = int.from_bytes(raw[byte_start:byte_end], byteorder='big', signed=signed) * scale + offset
     
     data_dictionary['values'] = data_parse_dictionary
     data_dictionary['timestamp'] = str(datetime.now())
@@ -150,21 +172,26 @@ def upload_file(bucket_name, json_data):
     s3object = s3.Object(bucket_name, filename)
 
     s3object.put(
-        Body=(bytes(json.dumps(json_data).encode('UTF-8')))
+        Body=orjson.dumps(json_data)
     )
 
-data_parse_dictionary, total_length = create_parser_dictionaries("ifm-vvb020.xml")
-j = 0
-
-while  j < 10000:
-    response = requests.request("POST", url, headers=headers, data=read_blob_data_payload)
-    json_data = json.loads(response.text)  # convert to json
-    return_code = json_data["code"]
-    if return_code != 200:
-        print("Error in transmission, code: ", return_code)
-        exit(0)
-    value = json_data['data']['value']
-    parsed_data_dic = data_parser(data_parse_dictionary, total_length, value)
-    upload_file('iot-test-lundbeck-poc-ifm', parsed_data_dic)
-    j = j + 1
-    time.sleep(10)
+if __name__ == '__main__':
+    data_parse_dictionary, total_length, data_types = create_parser_dictionaries(iodd_file)
+    parser_plan, payload_length = create_parser_plan(data_parse_dictionary, total_length, data_types)
+    j = 0
+    # one keep-alive connection to the IO-Link master for the whole run
+    session = requests.Session()
+    session.headers.update(headers)
+
+    while  j < 10000:
+        response = session.post(url, data=read_blob_data_payload)
+        json_data = orjson.loads(response.content)  # convert to json
+        return_code = json_data["code"]
+        if return_code != 200:
+            print("Error in transmission, code: ", return_code)
+            exit(0)
+        value = json_data['data']['value']
+        parsed_data_dic = data_parser(data_parse_dictionary, parser_plan, payload_length, value)
+        upload_file('iot-test-lundbeck-poc-ifm', parsed_data_dic)
+        j = j + 1
+        time.sleep(10)
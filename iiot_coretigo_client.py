@@ -4,19 +4,23 @@ import logging
 from asyncua import Client, client
 
 _logger = logging.getLogger('asyncua')
-async def client_reader(client, idx, nodeid):
-        node_string = "ns={};i={}".format(idx, nodeid)
-        var = client.get_node(node_string)
-        data = await var.read_value()
-        return data
-async def client_writer(client, idx, nodeid, data):
-        node_string = "ns={};i={}".format(idx, nodeid)
-        var = client.get_node(node_string)
-        data = float(data)
-        await var.write_value(data)
-        return data
+def client_nodes(client, idx, nodeids):
+        # resolve the Node objects once, the polling loop only reads/writes them
+        return [client.get_node("ns={};i={}".format(idx, nodeid)) for nodeid in nodeids]
+async def client_batch_reader(client, nodes):
+        # one Read service call for all nodes instead of one round trip per node,
+        # checking each status the way read_value does instead of passing on None
+        data_values = await client.read_attributes(nodes)
+        for data_value in data_values:
+            data_value.StatusCode.check()
+        return [data_value.Value.Value for data_value in data_values]
+async def client_batch_writer(client, nodes, data_list):
+        data_list = [float(data) for data in data_list]
+        # one Write service call for all nodes instead of one round trip per node
+        await client.write_values(nodes, data_list)
+        return data_list
 def data_converter(bytes_raw, dict_converter):
-        data_bytes = bytes_raw[dict_converter["start"],dict_converter["end"]]
+        data_bytes = bytes_raw[dict_converter["start"]:dict_converter["end"]]
         data = int.from_bytes(data_bytes, byteorder='big',signed=True)
         value = data * dict_converter["gradient"]
         return value
@@ -40,24 +44,30 @@ async def main():
     nsidx = 2
     tigo_nodeids = [32824, 98360, 163896, 1234] #[pressure pipe, #pressure tan level, temperature pipe, conductivity]
     nodeids = [2,3,4,5] #[pressure pipe, #pressure tan level, temperature pipe, conductivity]
-    dict_conv1 = {"nbytes":4, "rbytes":4, "start":2 , "end":16, "gradient":0.01, "conversion": 1}
-    dict_conv2 = {"nbytes":4, "rbytes":4, "start":2 , "end":16, "gradient":0.01, "conversion": 0.0254}
-    dict_conv3 = {"nbytes":2, "rbytes":2, "start":0 , "end":16, "gradient":0.1, "conversion": 1}
-    dict_conv4 = {"nbytes":2, "rbytes":2, "start":0 , "end":16, "gradient":0.1, "conversion": 1}
-    converters = [dict_conv1 , dict_conv2, dict_conv3, dict_conv4]
     
-    while(True):
-            data_list = []
-            async with Client(url=coretigo_url) as tigo_client:
-                for tigo_nodeid, converter in zip(tigo_nodeids, converters):
-                    raw_data = await client_reader(tigo_client, tigo_nsidx, tigo_nodeid)
-                    #data = data_converter(raw_data , converter)
-                    data_list.append(raw_data)
-            print(data_list)
-            async with Client(url=url) as client:
-                for tigo_nodeid, nodeid, converter, data in zip(tigo_nodeids, nodeids, converters, data_list):
-                    await client_writer(client, nsidx, nodeid, data)
+    # keep both sessions open across polls instead of reconnecting every second,
+    # and open them side by side rather than one after the other
+    tigo_client = Client(url=coretigo_url)
+    client = Client(url=url)
+    tigo_nodes = client_nodes(tigo_client, tigo_nsidx, tigo_nodeids)
+    nodes = client_nodes(client, nsidx, nodeids)
+    clients = [tigo_client, client]
+    connected = []
+    try:
+        # let both connects finish before raising, so a session that did open is still closed below
+        results = await asyncio.gather(*(c.connect() for c in clients), return_exceptions=True)
+        connected = [c for c, result in zip(clients, results) if not isinstance(result, BaseException)]
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        while(True):
+            data_list = await client_batch_reader(tigo_client, tigo_nodes)
+            _logger.debug('CoreTigo values: %s', data_list)
+            await client_batch_writer(client, nodes, data_list)
             await asyncio.sleep(1)
+    finally:
+        # a failing disconnect must not hide the exception that got us here
+        await asyncio.gather(*(c.disconnect() for c in connected), return_exceptions=True)
        
 
 
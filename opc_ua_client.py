@@ -19,7 +19,7 @@ async def client_writer(client, idx, nodeid, data):
         print(data)
         return data
 def data_converter(bytes_raw, dict_converter):
-        data_bytes = bytes_raw[dict_converter["start"],dict_converter["end"]]
+        data_bytes = bytes_raw[dict_converter["start"]:dict_converter["end"]]
         data = int.from_bytes(data_bytes, byteorder='big',signed=True)
         value = data * dict_converter["gradient"]
         return value
@@ -1,21 +1,20 @@
 import asyncio
 import logging
-import time
 
 from asyncua import Client, Server
 from asyncua import ua
 
 _logger = logging.getLogger('asyncua')
 
-async def client_reader(client, idx, nodeid):
-        print(idx, nodeid)
-        var = client.get_node(ua.NodeId(nodeid, idx))
-        data = await var.read_value()
-        print('byte data is')
-        print(data)
-        return data
+async def client_batch_reader(client, nodes):
+        # one Read service call for all nodes instead of one round trip per node,
+        # checking each status the way read_value does instead of passing on None
+        data_values = await client.read_attributes(nodes)
+        for data_value in data_values:
+            data_value.StatusCode.check()
+        return [data_value.Value.Value for data_value in data_values]
 def data_converter(bytes_raw, dict_converter):
-        data_bytes = bytes_raw[dict_converter["start"],dict_converter["end"]]
+        data_bytes = bytes_raw[dict_converter["start"]:dict_converter["end"]]
         data = int.from_bytes(data_bytes, byteorder='big',signed=True)
         value = data * dict_converter["gradient"]
         return value
@@ -27,6 +26,9 @@ async def main():
     dict_conv2 = {"nbytes":4, "rbits":0, "start":0 , "end":2, "gradient":0.01, "conversion": 0.0254}
     dict_conv3 = {"nbytes":2, "rbits":0, "start":0 , "end":2, "gradient":0.1, "conversion": 1}
     converters = [dict_conv1 , dict_conv2, dict_conv3]
+    for dict_converter in converters:
+        # fold the fixed-point shift into the gradient once instead of per sample
+        dict_converter["scale"] = dict_converter["gradient"] / 2**(dict_converter["rbits"])
     # setup our server
     server = Server()
     await server.init()
@@ -45,17 +47,18 @@ async def main():
         port3_PI = await myobj.add_variable(idx, 'Port 3', 0.0)
         #port4_PI = await myobj.add_variable(idx, 'Port 4', 0.0)
         ports = [port1_PI, port2_PI, port3_PI]
+        # resolve the CoreTigo nodes once instead of on every poll
+        tigo_nodes = [client.get_node(ua.NodeId(nodeid, nsidx)) for nodeid in nodeids]
         while True:
-            for nodeid, dict_converter, port in zip(nodeids, converters, ports):
-                var = client.get_node(ua.NodeId(nodeid, nsidx))
-                data_raw = await var.read_value()
+            data_raws = await client_batch_reader(client, tigo_nodes)
+            for data_raw, dict_converter, port in zip(data_raws, converters, ports):
                 data_bytes = data_raw[dict_converter["start"]:dict_converter["end"]]
-                data = int.from_bytes(data_bytes , byteorder='big',signed=True)/2**(dict_converter["rbits"])
-                value = data * dict_converter["gradient"]
+                data = int.from_bytes(data_bytes , byteorder='big',signed=True)
+                value = data * dict_converter["scale"]
                 await port.write_value(value)
-                print('data to server is')
-                print(await port.get_value())
-            time.sleep(10)
+                _logger.debug('data to server is %s', value)
+            # yield to the embedded server between polls instead of blocking the event loop
+            await asyncio.sleep(10)
 
 
 if __name__ == "__main__":